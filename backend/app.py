@@ -1,10 +1,22 @@
 import os
+from datetime import datetime, timedelta, timezone
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, jwt_required, get_jwt_identity
 from dotenv import load_dotenv
-from models import db, User, Course, Enrollment
+from sqlalchemy.orm import aliased
+from models import (
+    db,
+    User,
+    Course,
+    Enrollment,
+    ArchivedEnrollment,
+    CourseRecommendation,
+)
 from auth import register_auth_routes, admin_required
+from jobs import start_purge, start_archive, start_recommendation_refresh
+from profiling import register_profiler
+from group_commit import enroll, submit_enrollment
 
 load_dotenv()
 
@@ -21,6 +33,21 @@ app.config["SQLALCHEMY_DATABASE_URI"] = (
     f"sqlite:///{os.path.join(app.instance_path, 'campus.db')}"
 )
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# "hard" deletes rows immediately; "soft" hides them and purges in the background
+app.config["DELETE_MODE"] = os.getenv("DELETE_MODE", "hard")
+app.config["PURGE_BATCH_SIZE"] = int(os.getenv("PURGE_BATCH_SIZE", "1000"))
+# Completed/dropped enrollments older than this move to enrollment_archive
+app.config["ARCHIVE_AFTER_DAYS"] = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+app.config["ARCHIVE_BATCH_SIZE"] = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# Fraction of requests profiled without the admin X-Profile header (0 = off)
+app.config["PROFILE_SAMPLE_RATE"] = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Batch concurrent enrollment writes into one transaction per window
+app.config["GROUP_COMMIT"] = os.getenv("GROUP_COMMIT", "false").lower() == "true"
+app.config["GROUP_COMMIT_WINDOW_MS"] = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+app.config["GROUP_COMMIT_MAX_BATCH"] = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "500"))
+app.config["GROUP_COMMIT_TIMEOUT"] = float(os.getenv("GROUP_COMMIT_TIMEOUT", "10"))
+# Number of related courses stored per course
+app.config["RECOMMENDATIONS_TOP_N"] = int(os.getenv("RECOMMENDATIONS_TOP_N", "10"))
 app.config["JWT_SECRET_KEY"] = os.getenv(
     "JWT_SECRET_KEY", "your-secret-key-change-in-production"
 )
@@ -41,7 +68,8 @@ CORS(
                 "http://localhost:3001",
                 "http://127.0.0.1:3001",
             ],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "X-Profile"],
+            "expose_headers": ["X-Profile-Report"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
             "supports_credentials": True,
         }
@@ -51,6 +79,7 @@ jwt = JWTManager(app)
 
 # Register auth routes
 register_auth_routes(app)
+register_profiler(app)
 
 # ==================== COURSE ROUTES ====================
 
@@ -59,7 +88,7 @@ register_auth_routes(app)
 def get_courses():
     """Get all available courses."""
     try:
-        courses = Course.query.all()
+        courses = Course.visible().all()
         return jsonify([course.to_dict() for course in courses]), 200
     except Exception as e:
         print(f"Error fetching courses: {str(e)}")
@@ -69,12 +98,64 @@ def get_courses():
 @app.route("/api/courses/<int:course_id>", methods=["GET"])
 def get_course(course_id):
     """Get a specific course."""
-    course = Course.query.get(course_id)
+    course = Course.visible().filter_by(id=course_id).first()
     if not course:
         return jsonify({"error": "Course not found"}), 404
     return jsonify(course.to_dict()), 200
 
 
+@app.route("/api/courses/<int:course_id>/related", methods=["GET"])
+def get_related_courses(course_id):
+    """Get courses that students of this course also enrolled in."""
+    source = aliased(Course)
+    related = (
+        db.session.query(CourseRecommendation, Course)
+        .join(source, source.id == CourseRecommendation.course_id)
+        .join(Course, Course.id == CourseRecommendation.related_course_id)
+        .filter(
+            CourseRecommendation.course_id == course_id,
+            source.deleted_at.is_(None),
+            Course.deleted_at.is_(None),
+        )
+        .order_by(CourseRecommendation.rank)
+        .all()
+    )
+
+    if not related and not Course.visible().filter_by(id=course_id).first():
+        return jsonify({"error": "Course not found"}), 404
+
+    return (
+        jsonify(
+            [
+                {
+                    "id": course.id,
+                    "title": course.title,
+                    "image_url": course.image_url or "",
+                    "score": round(recommendation.score, 4),
+                }
+                for recommendation, course in related
+            ]
+        ),
+        200,
+    )
+
+
+@app.route("/api/courses/recommendations/refresh", methods=["POST"])
+@admin_required
+def refresh_course_recommendations():
+    """Rebuild related-course recommendations in the background (admin only).
+
+    Incremental unless ``{"full": true}`` is sent; a full rebuild is needed
+    after enrollments are deleted or archived.
+    """
+    from flask import request
+
+    data = request.get_json(silent=True) or {}
+    start_recommendation_refresh(app, full=bool(data.get("full")))
+
+    return jsonify({"message": "Recommendation refresh started"}), 202
+
+
 @app.route("/api/courses", methods=["POST"])
 @admin_required
 def create_course():
@@ -90,7 +171,7 @@ def create_course():
         return jsonify({"error": "Instructor ID is required"}), 400
 
     # Verify instructor exists
-    instructor = User.query.get(data.get("instructor_id"))
+    instructor = User.visible().filter_by(id=data.get("instructor_id")).first()
     if not instructor:
         return jsonify({"error": "Instructor not found"}), 404
 
@@ -114,7 +195,7 @@ def update_course(course_id):
     """Update a course (admin only)."""
     from flask import request
 
-    course = Course.query.get(course_id)
+    course = Course.visible().filter_by(id=course_id).first()
     if not course:
         return jsonify({"error": "Course not found"}), 404
 
@@ -125,7 +206,7 @@ def update_course(course_id):
     if data.get("description"):
         course.description = data["description"]
     if data.get("instructor_id"):
-        instructor = User.query.get(data.get("instructor_id"))
+        instructor = User.visible().filter_by(id=data.get("instructor_id")).first()
         if not instructor:
             return jsonify({"error": "Instructor not found"}), 404
         course.instructor_id = data["instructor_id"]
@@ -142,13 +223,31 @@ def update_course(course_id):
 @app.route("/api/courses/<int:course_id>", methods=["DELETE"])
 @admin_required
 def delete_course(course_id):
-    """Delete a course (admin only)."""
-    course = Course.query.get(course_id)
+    """Delete a course (admin only).
+
+    Enrollments are removed by the database's ON DELETE CASCADE. With
+    ``?mode=soft`` (or DELETE_MODE=soft) the course is hidden immediately and
+    purged in background batches instead.
+    """
+    from flask import request
+
+    course = Course.visible().filter_by(id=course_id).first()
     if not course:
         return jsonify({"error": "Course not found"}), 404
 
-    db.session.delete(course)
-    db.session.commit()
+    mode = request.args.get("mode", app.config["DELETE_MODE"])
+    if mode not in ("hard", "soft"):
+        return jsonify({"error": "Mode must be 'hard' or 'soft'"}), 400
+
+    if mode == "soft":
+        course.deleted_at = datetime.utcnow()
+        db.session.commit()
+        start_purge(app)
+    else:
+        db.session.delete(course)
+        db.session.commit()
+        # Its enrollments went with it, so every course's neighbours may shift
+        start_recommendation_refresh(app, full=True)
 
     return jsonify({"message": "Course deleted successfully"}), 200
 
@@ -168,40 +267,79 @@ def enroll_course():
     if not data or not data.get("course_id"):
         return jsonify({"error": "Course ID is required"}), 400
 
-    course = Course.query.get(data["course_id"])
-    if not course:
-        return jsonify({"error": "Course not found"}), 404
-
-    if len(course.enrollments) >= course.capacity:
-        return jsonify({"error": "Course is full"}), 400
-
-    existing = Enrollment.query.filter_by(
-        user_id=user_id, course_id=data["course_id"]
-    ).first()
-    if existing:
-        return jsonify({"error": "Already enrolled in this course"}), 400
+    if app.config["GROUP_COMMIT"]:
+        payload, status = submit_enrollment(app, user_id, data["course_id"])
+    else:
+        payload, status = enroll(user_id, data["course_id"])
 
-    enrollment = Enrollment(user_id=user_id, course_id=data["course_id"])
-    db.session.add(enrollment)
-    db.session.commit()
+    if status == 201:
+        start_recommendation_refresh(app)
 
-    return jsonify(enrollment.to_dict()), 201
+    return jsonify(payload), status
 
 
 @app.route("/api/enrollments/user/<int:user_id>", methods=["GET"])
 @jwt_required()
 def get_user_enrollments(user_id):
-    """Get enrollments for a specific user."""
+    """Get enrollments for a specific user.
+
+    Pass ``?include_history=true`` to also return archived enrollments.
+    """
+    from flask import request
+
     current_user_id = int(get_jwt_identity())
-    current_user = User.query.get(current_user_id)
+    current_user = User.visible().filter_by(id=current_user_id).first()
 
     if current_user_id != user_id and current_user.role != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
-    enrollments = Enrollment.query.filter_by(user_id=user_id).all()
+    enrollments = (
+        Enrollment.query.join(Course)
+        .filter(Enrollment.user_id == user_id, Course.deleted_at.is_(None))
+        .all()
+    )
+    if request.args.get("include_history", "false").lower() == "true":
+        enrollments += (
+            ArchivedEnrollment.query.join(Course)
+            .filter(
+                ArchivedEnrollment.user_id == user_id, Course.deleted_at.is_(None)
+            )
+            .all()
+        )
     return jsonify([e.to_dict() for e in enrollments]), 200
 
 
+@app.route("/api/enrollments/archive", methods=["POST"])
+@admin_required
+def archive_enrollments():
+    """Move old completed/dropped enrollments to the archive (admin only).
+
+    Runs in the background. The cutoff defaults to ARCHIVE_AFTER_DAYS ago and
+    can be overridden with an ISO date in ``before``.
+    """
+    from flask import request
+
+    data = request.get_json(silent=True) or {}
+
+    if data.get("before"):
+        try:
+            before = datetime.fromisoformat(data["before"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid 'before' date"}), 400
+        if before.tzinfo is not None:
+            # enrolled_at is stored as naive UTC
+            before = before.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        before = datetime.utcnow() - timedelta(days=app.config["ARCHIVE_AFTER_DAYS"])
+
+    start_archive(app, before)
+
+    return (
+        jsonify({"message": "Archive job started", "before": before.isoformat()}),
+        202,
+    )
+
+
 # ==================== USER ROUTES ====================
 
 
@@ -209,7 +347,7 @@ def get_user_enrollments(user_id):
 def get_users():
     """Get all users."""
     try:
-        users = User.query.all()
+        users = User.visible().all()
         return jsonify([user.to_dict() for user in users]), 200
     except Exception as e:
         print(f"Error fetching users: {str(e)}")
@@ -219,7 +357,7 @@ def get_users():
 @app.route("/api/users/<int:user_id>", methods=["GET"])
 def get_user(user_id):
     """Get a specific user."""
-    user = User.query.get(user_id)
+    user = User.visible().filter_by(id=user_id).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
     return jsonify(user.to_dict()), 200
@@ -234,11 +372,11 @@ def update_user(user_id):
     current_user_id = int(get_jwt_identity())
 
     # Users can only update their own profile unless they're admin
-    user = User.query.get(user_id)
+    user = User.visible().filter_by(id=user_id).first()
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    current_user = User.query.get(current_user_id)
+    current_user = User.visible().filter_by(id=current_user_id).first()
     if current_user_id != user_id and current_user.role != "admin":
         return jsonify({"error": "Unauthorized"}), 403
 
@@ -257,6 +395,39 @@ def update_user(user_id):
     return jsonify(user.to_dict()), 200
 
 
+@app.route("/api/users/<int:user_id>", methods=["DELETE"])
+@admin_required
+def delete_user(user_id):
+    """Delete a user (admin only).
+
+    Accepts the same ``mode`` as course deletion. Users who still instruct
+    courses must have those courses reassigned or deleted first.
+    """
+    from flask import request
+
+    user = User.visible().filter_by(id=user_id).first()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    mode = request.args.get("mode", app.config["DELETE_MODE"])
+    if mode not in ("hard", "soft"):
+        return jsonify({"error": "Mode must be 'hard' or 'soft'"}), 400
+
+    if Course.query.filter_by(instructor_id=user_id).first():
+        return jsonify({"error": "User still instructs courses"}), 400
+
+    if mode == "soft":
+        user.deleted_at = datetime.utcnow()
+        db.session.commit()
+        start_purge(app)
+    else:
+        db.session.delete(user)
+        db.session.commit()
+        start_recommendation_refresh(app, full=True)
+
+    return jsonify({"message": "User deleted successfully"}), 200
+
+
 # ==================== JWT ERROR HANDLERS ====================
 
 
@@ -276,6 +447,17 @@ def missing_token_callback(error):
     )
 
 
+@jwt.user_lookup_loader
+def user_lookup_callback(jwt_header, jwt_payload):
+    # Tokens of soft-deleted users stop working before the purge runs
+    return User.visible().filter_by(id=jwt_payload["sub"]).first()
+
+
+@jwt.user_lookup_error_loader
+def user_lookup_error_callback(jwt_header, jwt_payload):
+    return jsonify({"error": "User not found", "details": "user_deleted"}), 401
+
+
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header, jwt_payload):
     return jsonify({"error": "Token has expired", "details": "token_expired"}), 401
@@ -1,19 +1,42 @@
 from flask import jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import (
+    create_access_token,
+    jwt_required,
+    get_jwt_identity,
+    verify_jwt_in_request,
+)
+from flask_jwt_extended.exceptions import JWTExtendedException
 from functools import wraps
+from jwt import PyJWTError
 from models import User, db
 
 
+def _is_admin(user_id):
+    user = User.visible().filter_by(id=user_id).first()
+    return bool(user and user.role == "admin")
+
+
+def is_admin_request():
+    """Return True if the current request carries a valid admin JWT.
+
+    Unlike ``admin_required`` this never rejects the request, so it can be
+    used by hooks that only change behaviour for admins.
+    """
+    try:
+        if not verify_jwt_in_request(optional=True):
+            return False
+    except (JWTExtendedException, PyJWTError):
+        return False
+    return _is_admin(get_jwt_identity())
+
+
 def admin_required(fn):
     """Custom decorator to check if user is admin."""
 
     @wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
-        user = User.query.get(user_id)
-
-        if not user or user.role != "admin":
+        if not _is_admin(get_jwt_identity()):
             return jsonify({"error": "Admin access required"}), 403
 
         return fn(*args, **kwargs)
@@ -76,7 +99,7 @@ def register_auth_routes(app):
         if not data or not data.get("email") or not data.get("password"):
             return jsonify({"error": "Missing email or password"}), 400
 
-        user = User.query.filter_by(email=data["email"]).first()
+        user = User.visible().filter_by(email=data["email"]).first()
 
         if not user or not user.check_password(data["password"]):
             return jsonify({"error": "Invalid credentials"}), 401
@@ -98,7 +121,7 @@ def register_auth_routes(app):
     @jwt_required()
     def get_current_user():
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = User.visible().filter_by(id=user_id).first()
 
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""Benchmark: deleting a course with many enrollments.
+
+Compares the old ORM cascade (load every enrollment, delete one by one), the
+database ON DELETE CASCADE path, and soft delete followed by a batched purge.
+Runs against a throwaway SQLite file, never the real campus.db.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from sqlalchemy import insert
+from datetime import datetime
+from models import db, User, Course, Enrollment
+from jobs import purge_course
+
+ENROLLMENTS = int(os.getenv("BENCH_ENROLLMENTS", "100000"))
+
+
+def make_app(path):
+    bench_app = Flask(__name__)
+    bench_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    bench_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(bench_app)
+    return bench_app
+
+
+def seed():
+    """Create one course with ENROLLMENTS students and return its id."""
+    db.drop_all()
+    db.create_all()
+    instructor = User(username="bench-instructor", email="i@bench", password_hash="x")
+    db.session.add(instructor)
+    db.session.commit()
+    course = Course(
+        title="Bench", instructor_id=instructor.id, capacity=ENROLLMENTS
+    )
+    db.session.add(course)
+    db.session.commit()
+
+    db.session.execute(
+        insert(User),
+        [
+            {"username": f"s{i}", "email": f"s{i}@bench", "password_hash": "x"}
+            for i in range(ENROLLMENTS)
+        ],
+    )
+    first_student = instructor.id + 1
+    db.session.execute(
+        insert(Enrollment),
+        [
+            {"user_id": first_student + i, "course_id": course.id}
+            for i in range(ENROLLMENTS)
+        ],
+    )
+    db.session.commit()
+    db.session.expire_all()
+    return course.id
+
+
+def orm_cascade(course_id):
+    course = db.session.get(Course, course_id)
+    for enrollment in course.enrollments:
+        db.session.delete(enrollment)
+    db.session.delete(course)
+    db.session.commit()
+
+
+def db_cascade(course_id):
+    course = db.session.get(Course, course_id)
+    db.session.delete(course)
+    db.session.commit()
+
+
+def soft_delete(course_id):
+    course = db.session.get(Course, course_id)
+    course.deleted_at = datetime.utcnow()
+    db.session.commit()
+
+
+def run(label, fn, course_id):
+    start = time.perf_counter()
+    fn(course_id)
+    elapsed = time.perf_counter() - start
+    print(f"   {label:<28} {elapsed * 1000:10.1f} ms")
+    return elapsed
+
+
+if __name__ == "__main__":
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    bench_app = make_app(path)
+
+    print("=" * 60)
+    print(f"DELETE COURSE BENCHMARK ({ENROLLMENTS} enrollments)")
+    print("=" * 60)
+
+    try:
+        with bench_app.app_context():
+            run("ORM cascade (old)", orm_cascade, seed())
+            run("ON DELETE CASCADE", db_cascade, seed())
+
+            course_id = seed()
+            run("Soft delete (hide)", soft_delete, course_id)
+            run(
+                "Background purge (batched)",
+                lambda cid: purge_course(cid, batch_size=1000),
+                course_id,
+            )
+            assert Enrollment.query.count() == 0
+    finally:
+        os.remove(path)
+
+    print("=" * 60)
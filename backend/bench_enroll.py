@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""Benchmark: enrollments per second, commit-per-request vs group commit.
+
+Simulates a registration burst: many threads enroll distinct students into
+one popular course at the same time. Runs against a throwaway SQLite file,
+never the real campus.db.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from flask import Flask
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from models import db, User, Course, Enrollment
+from group_commit import enroll, submit_enrollment
+
+STUDENTS = int(os.getenv("BENCH_STUDENTS", "2000"))
+THREADS = int(os.getenv("BENCH_THREADS", "32"))
+
+
+def make_app(path):
+    bench_app = Flask(__name__)
+    bench_app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    bench_app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # One connection per request thread plus the group-commit writer
+    bench_app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"pool_size": THREADS + 1}
+    bench_app.config["GROUP_COMMIT_WINDOW_MS"] = 5
+    db.init_app(bench_app)
+    return bench_app
+
+
+def seed():
+    """Create STUDENTS users and one course with room for all but ten."""
+    db.drop_all()
+    db.create_all()
+    instructor = User(username="bench-instructor", email="i@bench", password_hash="x")
+    db.session.add(instructor)
+    db.session.commit()
+    course = Course(title="Bench", instructor_id=instructor.id, capacity=STUDENTS - 10)
+    db.session.add(course)
+    db.session.commit()
+
+    db.session.execute(
+        insert(User),
+        [
+            {"username": f"s{i}", "email": f"s{i}@bench", "password_hash": "x"}
+            for i in range(STUDENTS)
+        ],
+    )
+    db.session.commit()
+    return course.id, course.capacity, instructor.id + 1
+
+
+def burst(bench_app, label, enroll_fn):
+    with bench_app.app_context():
+        course_id, capacity, first_student = seed()
+
+    def one(user_id):
+        with bench_app.app_context():
+            try:
+                return enroll_fn(user_id, course_id)[1]
+            except OperationalError:
+                # "database is locked" once SQLite's busy timeout runs out
+                db.session.rollback()
+                return 500
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = list(pool.map(one, range(first_student, first_student + STUDENTS)))
+    elapsed = time.perf_counter() - start
+
+    with bench_app.app_context():
+        stored = Enrollment.query.count()
+
+    print(
+        f"   {label:<22} {STUDENTS / elapsed:10.0f} req/s   "
+        f"{statuses.count(201)} enrolled, {statuses.count(400)} full, "
+        f"{statuses.count(500)} failed, {stored} stored"
+    )
+    if stored > capacity:
+        # The capacity check and insert race when every request commits alone
+        print(f"   {'':<22} !! OVERBOOKED: {stored} stored for capacity {capacity}")
+    return stored <= capacity
+
+
+if __name__ == "__main__":
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    bench_app = make_app(path)
+
+    print("=" * 60)
+    print(f"ENROLLMENT BURST BENCHMARK ({STUDENTS} students, {THREADS} threads)")
+    print("=" * 60)
+
+    try:
+        baseline_ok = burst(bench_app, "Commit per request", enroll)
+        grouped_ok = burst(
+            bench_app,
+            "Group commit",
+            lambda user_id, course_id: submit_enrollment(bench_app, user_id, course_id),
+        )
+    finally:
+        os.remove(path)
+
+    print("=" * 60)
+    if not baseline_ok:
+        print("Commit per request overbooked the course: it accepted requests")
+        print("past capacity, so its req/s is not an apples-to-apples baseline.")
+    if not grouped_ok:
+        print("Group commit overbooked the course.")
+        sys.exit(1)
@@ -0,0 +1,190 @@
+"""Enrollment writes, either one commit per request or grouped.
+
+With GROUP_COMMIT enabled, request threads hand their enrollment to a single
+writer thread, which collects everything that arrives within
+GROUP_COMMIT_WINDOW_MS and applies it in one transaction. On SQLite that turns
+one fsync per enrollment into one per batch. Capacity and duplicate checks
+see both the database and the earlier requests in the same batch, and every
+caller still gets its own response.
+
+Archived enrollments count as duplicates too, so moving a row to the archive
+never changes whether a student may enroll again.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from sqlalchemy import select, union
+from models import db, User, Course, Enrollment, ArchivedEnrollment
+
+_queue = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread = None
+
+
+def _rejection(user_exists, course, enrolled_count, already_enrolled):
+    if not user_exists:
+        return {"error": "User not found"}, 404
+    if not course:
+        return {"error": "Course not found"}, 404
+    if enrolled_count >= course.capacity:
+        return {"error": "Course is full"}, 400
+    if already_enrolled:
+        return {"error": "Already enrolled in this course"}, 400
+    return None
+
+
+def enroll(user_id, course_id):
+    """Enroll a user and commit immediately. Returns (payload, status)."""
+    course = Course.visible().filter_by(id=course_id).first()
+    enrolled_count = len(course.enrollments) if course else 0
+    existing = (
+        Enrollment.query.filter_by(user_id=user_id, course_id=course_id).first()
+        or ArchivedEnrollment.query.filter_by(
+            user_id=user_id, course_id=course_id
+        ).first()
+    )
+    user_exists = User.visible().filter_by(id=user_id).first() is not None
+
+    rejection = _rejection(user_exists, course, enrolled_count, existing is not None)
+    if rejection:
+        return rejection
+
+    enrollment = Enrollment(user_id=user_id, course_id=course_id)
+    db.session.add(enrollment)
+    db.session.commit()
+
+    return enrollment.to_dict(), 201
+
+
+def _apply_batch(batch):
+    # Claim every request; callers that already gave up are dropped unwritten
+    batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+    if not batch:
+        return
+
+    courses = {}
+    counts = {}
+    accepted = []
+
+    # One lookup for the users and one for every (user, course) pair already
+    # enrolled or archived, so a bad request is rejected before it can fail
+    # the flush
+    user_ids = {user_id for user_id, _, _ in batch}
+    course_ids = {course_id for _, course_id, _ in batch}
+    live_users = set(
+        db.session.scalars(
+            select(User.id).where(User.id.in_(user_ids), User.deleted_at.is_(None))
+        )
+    )
+    taken = set(
+        db.session.execute(
+            union(
+                *(
+                    select(model.user_id, model.course_id).where(
+                        model.user_id.in_(user_ids), model.course_id.in_(course_ids)
+                    )
+                    for model in (Enrollment, ArchivedEnrollment)
+                )
+            )
+        ).all()
+    )
+
+    for user_id, course_id, future in batch:
+        if course_id not in courses:
+            courses[course_id] = Course.visible().filter_by(id=course_id).first()
+            counts[course_id] = Enrollment.query.filter_by(course_id=course_id).count()
+        course = courses[course_id]
+
+        already_enrolled = (user_id, course_id) in taken
+        rejection = _rejection(
+            user_id in live_users, course, counts[course_id], already_enrolled
+        )
+        if rejection:
+            future.set_result(rejection)
+            continue
+
+        enrollment = Enrollment(user_id=user_id, course_id=course_id)
+        db.session.add(enrollment)
+        counts[course_id] += 1
+        taken.add((user_id, course_id))
+        accepted.append((enrollment, future))
+
+    if not accepted:
+        return
+
+    db.session.flush()
+    results = [(enrollment.to_dict(), future) for enrollment, future in accepted]
+    db.session.commit()
+
+    for payload, future in results:
+        future.set_result((payload, 201))
+
+
+def _writer_loop(app):
+    window = app.config.get("GROUP_COMMIT_WINDOW_MS", 5) / 1000
+    max_batch = app.config.get("GROUP_COMMIT_MAX_BATCH", 500)
+
+    with app.app_context():
+        while True:
+            batch = [_queue.get()]
+            deadline = time.monotonic() + window
+            while len(batch) < max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                _apply_batch(batch)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Group commit error, retrying one by one: {str(e)}")
+                _apply_individually(batch)
+            finally:
+                db.session.remove()
+
+
+def _apply_individually(batch):
+    """Fallback after a failed batch: commit each pending request on its own."""
+    for user_id, course_id, future in batch:
+        if future.done():
+            continue
+        if not future.running() and not future.set_running_or_notify_cancel():
+            continue
+        try:
+            future.set_result(enroll(user_id, course_id))
+        except Exception as e:
+            db.session.rollback()
+            future.set_result(({"error": "Enrollment failed", "details": str(e)}, 500))
+
+
+def submit_enrollment(app, user_id, course_id):
+    """Queue an enrollment for the group-commit writer and wait for its result.
+
+    Returns the same (payload, status) pair as ``enroll``, or a 503 if the
+    writer has not picked the request up within GROUP_COMMIT_TIMEOUT seconds.
+    A 503 always means nothing was written: the request is cancelled, and one
+    the writer has already started on is waited for instead.
+    """
+    global _writer_thread
+
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(
+                target=_writer_loop, args=(app,), daemon=True
+            )
+            _writer_thread.start()
+
+    future = Future()
+    _queue.put((user_id, course_id, future))
+    try:
+        return future.result(timeout=app.config.get("GROUP_COMMIT_TIMEOUT", 10))
+    except TimeoutError:
+        if future.cancel():
+            return {"error": "Enrollment timed out, please try again"}, 503
+        return future.result()
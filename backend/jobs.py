@@ -0,0 +1,212 @@
+"""Background maintenance jobs that run outside the request cycle."""
+
+import threading
+from datetime import datetime
+from functools import partial
+from sqlalchemy import delete, insert, select
+from models import db, User, Course, Enrollment, ArchivedEnrollment
+from recommendations import refresh_recommendations
+
+ARCHIVABLE_STATUSES = ("completed", "dropped")
+
+_jobs_lock = threading.Lock()
+_pending_jobs = {}
+_job_threads = {}
+
+
+def _delete_in_batches(model, column, value, batch_size):
+    """Delete matching rows in short transactions so writers can interleave."""
+    total = 0
+    while True:
+        batch = select(model.id).where(column == value).limit(batch_size)
+        result = db.session.execute(
+            delete(model)
+            .where(model.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount == 0:
+            return total
+        total += result.rowcount
+
+
+def purge_course(course_id, batch_size=1000):
+    """Permanently remove a course and its enrollments, batch by batch."""
+    removed = _delete_in_batches(Enrollment, Enrollment.course_id, course_id, batch_size)
+    _delete_in_batches(
+        ArchivedEnrollment, ArchivedEnrollment.course_id, course_id, batch_size
+    )
+    db.session.execute(
+        delete(Course)
+        .where(Course.id == course_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return removed
+
+
+def purge_user(user_id, batch_size=1000):
+    """Permanently remove a user and their enrollments, batch by batch."""
+    removed = _delete_in_batches(Enrollment, Enrollment.user_id, user_id, batch_size)
+    _delete_in_batches(
+        ArchivedEnrollment, ArchivedEnrollment.user_id, user_id, batch_size
+    )
+    db.session.execute(
+        delete(User)
+        .where(User.id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return removed
+
+
+def purge_deleted(batch_size=1000):
+    """Purge every soft-deleted course, then every soft-deleted user.
+
+    Returns the number of enrollments removed.
+    """
+    removed = 0
+    course_ids = db.session.scalars(
+        select(Course.id).where(Course.deleted_at.is_not(None))
+    ).all()
+    for course_id in course_ids:
+        removed += purge_course(course_id, batch_size)
+
+    user_ids = db.session.scalars(
+        select(User.id).where(User.deleted_at.is_not(None))
+    ).all()
+    for user_id in user_ids:
+        removed += purge_user(user_id, batch_size)
+    return removed
+
+
+def archive_enrollments(before, batch_size=1000):
+    """Move completed and dropped enrollments older than ``before`` to the archive.
+
+    Each batch is copied and removed in one transaction, so a row is always
+    in exactly one of the two tables. Batches walk the primary key from where
+    the previous one stopped, so rows that stay behind are scanned only once.
+    """
+    total = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            select(Enrollment.id)
+            .where(
+                Enrollment.id > last_id,
+                Enrollment.status.in_(ARCHIVABLE_STATUSES),
+                Enrollment.enrolled_at < before,
+            )
+            .order_by(Enrollment.id)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return total
+        last_id = ids[-1]
+
+        db.session.execute(
+            insert(ArchivedEnrollment).from_select(
+                [
+                    "id",
+                    "user_id",
+                    "course_id",
+                    "status",
+                    "enrolled_at",
+                    "archived_at",
+                ],
+                select(
+                    Enrollment.id,
+                    Enrollment.user_id,
+                    Enrollment.course_id,
+                    Enrollment.status,
+                    Enrollment.enrolled_at,
+                    db.literal(datetime.utcnow()),
+                ).where(Enrollment.id.in_(ids)),
+            )
+        )
+        db.session.execute(
+            delete(Enrollment)
+            .where(Enrollment.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        total += len(ids)
+
+
+def _job_worker(app, name):
+    with app.app_context():
+        while True:
+            with _jobs_lock:
+                job = _pending_jobs.pop(name, None)
+                if job is None:
+                    del _job_threads[name]
+                    return
+            try:
+                job()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Background job '{name}' error: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+def _schedule(app, name, job, merge=None):
+    """Run ``job`` in a background thread inside an app context.
+
+    Only one thread runs per job name; a job scheduled while it is busy
+    replaces any earlier pending one and runs on its next pass. ``merge``,
+    if given, combines the pending job with the new one instead, under the
+    same lock so no concurrent schedule can slip in between.
+    """
+    with _jobs_lock:
+        pending = _pending_jobs.get(name)
+        if merge is not None and pending is not None:
+            job = merge(pending, job)
+        _pending_jobs[name] = job
+        if name not in _job_threads:
+            thread = threading.Thread(
+                target=_job_worker, args=(app, name), daemon=True
+            )
+            _job_threads[name] = thread
+            thread.start()
+
+
+def start_purge(app):
+    """Schedule a background purge of soft-deleted rows."""
+    batch_size = app.config.get("PURGE_BATCH_SIZE", 1000)
+
+    def job():
+        if purge_deleted(batch_size):
+            start_recommendation_refresh(app, full=True)
+
+    _schedule(app, "purge", job)
+
+
+def start_archive(app, before):
+    """Schedule a background move of old enrollments into the archive."""
+    batch_size = app.config.get("ARCHIVE_BATCH_SIZE", 1000)
+
+    def job():
+        if archive_enrollments(before, batch_size):
+            start_recommendation_refresh(app, full=True)
+
+    _schedule(app, "archive", job)
+
+
+def start_recommendation_refresh(app, full=False):
+    """Schedule a background refresh of course recommendations.
+
+    A pending full rebuild is never downgraded to an incremental one.
+    """
+    top_n = app.config.get("RECOMMENDATIONS_TOP_N", 10)
+    _schedule(
+        app,
+        "recommendations",
+        partial(refresh_recommendations, top_n=top_n, full=full),
+        merge=_merge_recommendation_refresh,
+    )
+
+
+def _merge_recommendation_refresh(pending, job):
+    full = pending.keywords["full"] or job.keywords["full"]
+    return partial(refresh_recommendations, top_n=job.keywords["top_n"], full=full)
@@ -1,10 +1,22 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
 
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite ignores ON DELETE CASCADE unless foreign keys are switched on."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 class User(db.Model):
     __tablename__ = "users"
 
@@ -14,10 +26,14 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), default="student")  # admin, student, instructor
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # set by soft delete
 
     # Relationships
     enrolled_courses = db.relationship(
-        "Enrollment", back_populates="user", cascade="all, delete-orphan"
+        "Enrollment",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
     courses_created = db.relationship(
         "Course", back_populates="instructor", foreign_keys="Course.instructor_id"
@@ -31,6 +47,11 @@ class User(db.Model):
         """Check if provided password matches the hash."""
         return check_password_hash(self.password_hash, password)
 
+    @classmethod
+    def visible(cls):
+        """Query for users that have not been soft-deleted."""
+        return cls.query.filter(cls.deleted_at.is_(None))
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -51,15 +72,24 @@ class Course(db.Model):
     capacity = db.Column(db.Integer, default=50)
     image_url = db.Column(db.String(500), default="")  # URL to course image
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # set by soft delete
 
     # Relationships
     instructor = db.relationship(
         "User", back_populates="courses_created", foreign_keys=[instructor_id]
     )
     enrollments = db.relationship(
-        "Enrollment", back_populates="course", cascade="all, delete-orphan"
+        "Enrollment",
+        back_populates="course",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
     )
 
+    @classmethod
+    def visible(cls):
+        """Query for courses that have not been soft-deleted."""
+        return cls.query.filter(cls.deleted_at.is_(None))
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -76,10 +106,23 @@ class Course(db.Model):
 
 class Enrollment(db.Model):
     __tablename__ = "enrollments"
+    # Never reuse ids: archived rows keep theirs, and recommendations
+    # checkpoint on the highest id seen
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey("courses.id"), nullable=False)
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    course_id = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
     status = db.Column(db.String(20), default="active")  # active, completed, dropped
     enrolled_at = db.Column(db.DateTime, default=datetime.utcnow)
 
@@ -96,3 +139,69 @@ class Enrollment(db.Model):
             "status": self.status,
             "enrolled_at": self.enrolled_at.isoformat(),
         }
+
+
+class ArchivedEnrollment(db.Model):
+    """Completed or dropped enrollment moved out of the hot table."""
+
+    __tablename__ = "enrollment_archive"
+
+    id = db.Column(db.Integer, primary_key=True)  # id it had in enrollments
+    user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    course_id = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    status = db.Column(db.String(20), nullable=False)  # completed, dropped
+    enrolled_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relationships
+    course = db.relationship("Course")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "course_id": self.course_id,
+            "course_title": self.course.title if self.course else None,
+            "status": self.status,
+            "enrolled_at": self.enrolled_at.isoformat(),
+            "archived": True,
+        }
+
+
+class CourseRecommendation(db.Model):
+    """Precomputed "students also enrolled in" neighbour of a course."""
+
+    __tablename__ = "course_recommendations"
+
+    course_id = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    rank = db.Column(db.Integer, primary_key=True)  # 1 = most related
+    related_course_id = db.Column(
+        db.Integer,
+        db.ForeignKey("courses.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    score = db.Column(db.Float, nullable=False)  # share of students also enrolled
+
+
+class RecommendationState(db.Model):
+    """Single-row checkpoint of the last enrollment folded into recommendations."""
+
+    __tablename__ = "recommendation_state"
+
+    id = db.Column(db.Integer, primary_key=True)
+    last_enrollment_id = db.Column(db.Integer, nullable=False, default=0)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
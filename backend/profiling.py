@@ -0,0 +1,155 @@
+"""On-demand per-request profiling.
+
+A request is profiled when an admin sends ``X-Profile: 1`` or when it is
+picked by PROFILE_SAMPLE_RATE. The report (cProfile call tree plus the SQL
+statements issued) is written to instance/profiles and its name returned in
+the ``X-Profile-Report`` response header. SQL parameters can hold emails and
+password hashes, so reports only list their types unless an admin sends
+``X-Profile: params``. When neither trigger fires the only cost is a header
+lookup per request and a flag check per SQL statement.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from flask import g, jsonify, request, send_from_directory
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from auth import admin_required, is_admin_request
+
+PROFILE_HEADER = "X-Profile"
+SHOW_PARAMS = "params"
+REPORT_HEADER = "X-Profile-Report"
+
+# cProfile cannot run two profilers at once, so only one request is
+# profiled at a time; others that ask while it is busy run unprofiled.
+_profile_lock = threading.Lock()
+_sql_capture = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_sql_capture, "queries", None) is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = getattr(_sql_capture, "queries", None)
+    if queries is not None and conn.info.get("profile_query_start"):
+        elapsed = time.perf_counter() - conn.info["profile_query_start"].pop()
+        if not _sql_capture.show_params:
+            parameters = _redact(parameters)
+        queries.append((elapsed, statement, parameters))
+
+
+def _redact(parameters):
+    """Describe parameters by type only, e.g. ``<str, int>``."""
+    if isinstance(parameters, list):  # executemany
+        return f"<{len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        values = parameters.values()
+    else:
+        values = parameters or ()
+    return "<" + ", ".join(type(value).__name__ for value in values) + ">"
+
+
+def _should_profile(app):
+    if request.headers.get(PROFILE_HEADER):
+        # Parameters are only kept for an admin who explicitly asks for them
+        g.profile_params = request.headers[PROFILE_HEADER] == SHOW_PARAMS
+        return is_admin_request()
+    rate = app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _build_report(profiler, queries, elapsed, status):
+    out = io.StringIO()
+    out.write(f"{request.method} {request.full_path.rstrip('?')} -> {status}\n")
+    out.write(f"Total: {elapsed * 1000:.1f} ms\n\n")
+
+    sql_total = sum(q[0] for q in queries)
+    out.write(f"SQL: {len(queries)} statements, {sql_total * 1000:.1f} ms\n")
+    for seconds, statement, parameters in queries:
+        statement = " ".join(statement.split())
+        if not isinstance(parameters, str):
+            parameters = repr(parameters)
+        out.write(f"  {seconds * 1000:8.2f} ms  {statement}  {parameters}\n")
+
+    out.write("\nCall tree (by cumulative time):\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(40)
+    stats.print_callees(20)
+    return out.getvalue()
+
+
+def register_profiler(app):
+    """Register the profiling hooks and report routes."""
+
+    report_dir = os.path.join(app.instance_path, "profiles")
+
+    @app.before_request
+    def start_profile():
+        if not _should_profile(app):
+            return
+        if not _profile_lock.acquire(blocking=False):
+            return
+
+        g.profiler = cProfile.Profile()
+        g.profile_started = time.perf_counter()
+        _sql_capture.queries = []
+        _sql_capture.show_params = g.get("profile_params", False)
+        g.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return response
+
+        try:
+            profiler.disable()
+            elapsed = time.perf_counter() - g.pop("profile_started")
+            queries = _sql_capture.queries
+            report = _build_report(profiler, queries, elapsed, response.status_code)
+
+            slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-")
+            name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.method}-{slug}.txt"
+            os.makedirs(report_dir, exist_ok=True)
+            with open(os.path.join(report_dir, name), "w") as f:
+                f.write(report)
+            response.headers[REPORT_HEADER] = name
+        finally:
+            _sql_capture.queries = None
+            _profile_lock.release()
+
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # after_request is skipped when a view raises; don't leak the lock
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            _sql_capture.queries = None
+            _profile_lock.release()
+
+    @app.route("/api/profiles", methods=["GET"])
+    @admin_required
+    def list_profiles():
+        """List stored profile reports, newest first (admin only)."""
+        if not os.path.isdir(report_dir):
+            return jsonify([]), 200
+        return jsonify(sorted(os.listdir(report_dir), reverse=True)), 200
+
+    @app.route("/api/profiles/<path:name>", methods=["GET"])
+    @admin_required
+    def get_profile(name):
+        """Download a stored profile report (admin only)."""
+        return send_from_directory(report_dir, name, mimetype="text/plain")
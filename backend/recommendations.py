@@ -0,0 +1,125 @@
+"""Precomputed "students also enrolled in" recommendations.
+
+Enrollments form a sparse user-by-course matrix X. For courses i and j,
+C = X^T X counts the students taking both, and the score of j for i is
+C[i, j] / n_i: the share of course i's students also enrolled in j. A row
+depends only on course i's own students, so when new enrollments arrive only
+the courses those students take need recomputing.
+"""
+
+from datetime import datetime
+import numpy as np
+from scipy import sparse
+from sqlalchemy import delete, func, insert, select
+from models import db, Enrollment, CourseRecommendation, RecommendationState
+
+
+def _co_enrollment_rows(course_ids):
+    """Co-enrollment counts for ``course_ids`` (or every course if None).
+
+    Returns (rows, row_course_ids, col_course_ids, course_sizes) where rows is
+    a CSR matrix with one row per course in row_course_ids.
+    """
+    query = select(Enrollment.user_id, Enrollment.course_id)
+    if course_ids is not None:
+        students = select(Enrollment.user_id).where(
+            Enrollment.course_id.in_(course_ids)
+        )
+        query = query.where(Enrollment.user_id.in_(students))
+
+    pairs = np.array(db.session.execute(query).all(), dtype=np.int64).reshape(-1, 2)
+    user_ids, user_index = np.unique(pairs[:, 0], return_inverse=True)
+    col_course_ids, course_index = np.unique(pairs[:, 1], return_inverse=True)
+
+    X = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float64), (user_index, course_index)),
+        shape=(len(user_ids), len(col_course_ids)),
+    )
+    X.data[:] = 1.0  # guard against duplicate rows
+
+    if course_ids is None:
+        row_course_ids = col_course_ids
+    else:
+        row_course_ids = np.intersect1d(col_course_ids, list(course_ids))
+    X_rows = X[:, np.searchsorted(col_course_ids, row_course_ids)]
+
+    rows = (X_rows.T @ X).tocsr()
+    course_sizes = np.asarray(X_rows.sum(axis=0)).ravel()
+    return rows, row_course_ids, col_course_ids, course_sizes
+
+
+def _top_neighbours(rows, row_course_ids, col_course_ids, course_sizes, top_n):
+    records = []
+    for r, course_id in enumerate(row_course_ids):
+        start, end = rows.indptr[r], rows.indptr[r + 1]
+        neighbours = col_course_ids[rows.indices[start:end]]
+        scores = rows.data[start:end] / course_sizes[r]
+
+        keep = neighbours != course_id
+        neighbours, scores = neighbours[keep], scores[keep]
+        # Highest score first, lower course id breaks ties
+        order = np.lexsort((neighbours, -scores))[:top_n]
+
+        records.extend(
+            {
+                "course_id": int(course_id),
+                "rank": rank,
+                "related_course_id": int(neighbours[i]),
+                "score": float(scores[i]),
+            }
+            for rank, i in enumerate(order, start=1)
+        )
+    return records
+
+
+def refresh_recommendations(top_n=10, full=False):
+    """Recompute stored recommendations; returns the number of courses updated.
+
+    Incremental by default: only courses taken by students with enrollments
+    newer than the checkpoint are recomputed, which relies on enrollment ids
+    never being reused (AUTOINCREMENT). ``full`` rebuilds every course; the
+    delete, purge and archive paths schedule one after removing enrollments.
+    """
+    state = db.session.get(RecommendationState, 1)
+    if state is None:
+        state = RecommendationState(id=1, last_enrollment_id=0)
+        db.session.add(state)
+        full = True
+
+    latest_id = db.session.scalar(select(func.max(Enrollment.id))) or 0
+
+    if full:
+        course_ids = None
+    else:
+        new_students = select(Enrollment.user_id).where(
+            Enrollment.id > state.last_enrollment_id
+        )
+        course_ids = set(
+            db.session.scalars(
+                select(Enrollment.course_id)
+                .where(Enrollment.user_id.in_(new_students))
+                .distinct()
+            )
+        )
+        if not course_ids:
+            db.session.rollback()
+            return 0
+
+    rows, row_course_ids, col_course_ids, course_sizes = _co_enrollment_rows(
+        course_ids
+    )
+    records = _top_neighbours(
+        rows, row_course_ids, col_course_ids, course_sizes, top_n
+    )
+
+    stale = delete(CourseRecommendation)
+    if course_ids is not None:
+        stale = stale.where(CourseRecommendation.course_id.in_(course_ids))
+    db.session.execute(stale.execution_options(synchronize_session=False))
+    if records:
+        db.session.execute(insert(CourseRecommendation), records)
+
+    state.last_enrollment_id = latest_id
+    state.refreshed_at = datetime.utcnow()
+    db.session.commit()
+    return len(row_course_ids)
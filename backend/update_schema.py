@@ -0,0 +1,136 @@
+"""Bring an existing campus.db up to the current schema without losing data.
+
+db.create_all() only creates missing tables, so databases created before
+soft delete need their new columns added, and `enrollments` has to be rebuilt
+for its ON DELETE CASCADE foreign keys, indexes and AUTOINCREMENT id (SQLite
+cannot alter constraints in place). Safe to run more than once.
+"""
+
+import sys
+from sqlalchemy.schema import CreateIndex, CreateTable
+from app import app, db
+from models import Enrollment, ArchivedEnrollment
+
+SOFT_DELETE_TABLES = ("users", "courses")
+
+
+def _normalize(sql):
+    return " ".join(sql.split())
+
+
+def _add_missing_columns(cur):
+    for table in SOFT_DELETE_TABLES:
+        columns = [row[1] for row in cur.execute(f"PRAGMA table_info({table})")]
+        if "deleted_at" not in columns:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN deleted_at DATETIME")
+            print(f"Added {table}.deleted_at")
+
+
+def _rebuild_enrollments(cur):
+    table = Enrollment.__table__
+    create_sql = str(CreateTable(table).compile(db.engine))
+
+    row = cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table.name,),
+    ).fetchone()
+    if row and _normalize(row[0]) == _normalize(create_sql):
+        return
+
+    columns = ", ".join(column.name for column in table.columns)
+    cur.execute(f"ALTER TABLE {table.name} RENAME TO {table.name}_old")
+    for index in table.indexes:
+        cur.execute(f"DROP INDEX IF EXISTS {index.name}")
+    cur.execute(create_sql)
+    for index in table.indexes:
+        cur.execute(str(CreateIndex(index).compile(db.engine)))
+    cur.execute(
+        f"INSERT INTO {table.name} ({columns}) "
+        f"SELECT {columns} FROM {table.name}_old"
+    )
+    cur.execute(f"DROP TABLE {table.name}_old")
+    print(f"Rebuilt {table.name}")
+
+
+def _separate_archive_ids(cur):
+    """Keep enrollment ids clear of ids already used in the archive.
+
+    Before AUTOINCREMENT, SQLite could hand an archived row's id to a new
+    enrollment; such rows get fresh ids, and the sequence starts above both
+    tables so it cannot happen again.
+    """
+    enrollments = Enrollment.__table__.name
+    archive = ArchivedEnrollment.__table__.name
+    next_id = cur.execute(
+        f"SELECT MAX(COALESCE((SELECT MAX(id) FROM {enrollments}), 0), "
+        f"COALESCE((SELECT MAX(id) FROM {archive}), 0))"
+    ).fetchone()[0]
+
+    clashes = [
+        row[0]
+        for row in cur.execute(
+            f"SELECT id FROM {enrollments} WHERE id IN (SELECT id FROM {archive})"
+        ).fetchall()
+    ]
+    for old_id in clashes:
+        next_id += 1
+        cur.execute(
+            f"UPDATE {enrollments} SET id = ? WHERE id = ?", (next_id, old_id)
+        )
+    if clashes:
+        print(f"Renumbered {len(clashes)} enrollments that clashed with the archive")
+
+    seq = cur.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = ?", (enrollments,)
+    ).fetchone()
+    if seq is None:
+        cur.execute(
+            "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+            (enrollments, next_id),
+        )
+    elif seq[0] < next_id:
+        cur.execute(
+            "UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (next_id, enrollments)
+        )
+
+
+def update_schema():
+    with app.app_context():
+        db.create_all()  # new tables only; existing ones are handled below
+
+        raw = db.engine.raw_connection()
+        conn = raw.driver_connection
+        isolation_level = conn.isolation_level
+        try:
+            # Manage the transaction by hand; foreign keys must be off while
+            # enrollments is swapped out, and PRAGMA has no effect inside one
+            conn.isolation_level = None
+            cur = conn.cursor()
+            cur.execute("PRAGMA foreign_keys=OFF")
+            cur.execute("BEGIN")
+            try:
+                _add_missing_columns(cur)
+                _rebuild_enrollments(cur)
+                _separate_archive_ids(cur)
+                problems = cur.execute("PRAGMA foreign_key_check").fetchall()
+                if problems:
+                    raise RuntimeError(f"Foreign key violations: {problems[:5]}")
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            finally:
+                cur.execute("PRAGMA foreign_keys=ON")
+        finally:
+            conn.isolation_level = isolation_level
+            raw.close()
+
+        print("Schema up to date.")
+
+
+if __name__ == "__main__":
+    try:
+        update_schema()
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)